@@ -1,59 +1,200 @@
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg') # Headless backend; the chart is only ever saved to disk
 import matplotlib.pyplot as plt
-import os
+import openpyxl
+from openpyxl.cell.cell import ERROR_CODES
 import re
+from itertools import islice
+from pathlib import Path
+
+# Pattern: ... - Ranks - [Group] - [Course Name] - Rank
+# Note: The separator is usually " - "
+_HEADER_RE = re.compile(r' - Ranks - (.*?) - (.*?) - Rank')
+
+# Cell values read_excel treats as missing by default (pandas' na_values),
+# plus Excel error cells, which openpyxl returns as their error strings
+_NA_VALUES = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null',
+}) | frozenset(ERROR_CODES)
+
+def _cell_value(row, i):
+    # Value of column i in a streamed row, with missing markers mapped to None
+    value = row[i] if i < len(row) else None
+    if isinstance(value, str) and value in _NA_VALUES:
+        return None
+    return value
+
+def _row_max_mean(arr):
+    # Mean over respondents of each row's highest score, skipping rows without any score
+    # np.fmax ignores NaN, so this is a single NaN-skipping max per row;
+    # rows that are all NaN (Did not take or didn't answer) stay NaN
+    row_score = np.fmax.reduce(arr, axis=1)
+    row_score = row_score[~np.isnan(row_score)]
+    if not row_score.size:
+        return float('nan')
+    # Accumulate the mean in float64
+    return row_score.mean(dtype=np.float64)
+
+def parse_header(header_tuple):
+    # Extract the question type, group and course name from a header tuple
+    # header_tuple[0] is the question text
+    # header_tuple[1] is the ImportId
+    q_text = str(header_tuple[0])
+
+    # Cheap substring test rejects non-rank columns before running any regex
+    if ' - Ranks - ' not in q_text:
+        return None
+
+    # Check if it's a relevant question (Core or Elective)
+    is_core = "CORE" in q_text
+    is_elective = "Elective" in q_text
+
+    if not (is_core or is_elective):
+        return None
+
+    # Extract Course Name and Group
+    match = _HEADER_RE.search(q_text)
+    if match:
+        group = match.group(1)
+        course_name = match.group(2)
+        return {
+            'type': 'Core' if is_core else 'Elective',
+            'group': group,
+            'course': course_name,
+            'col_idx': header_tuple
+        }
+    return None
+
+def score_courses(df, relevant_columns):
+    # Average rating per course from the parsed relevant columns of df
+    # We need to calculate a score for each course for each respondent
+    # Scoring:
+    # Most Beneficial: 3
+    # Neutral: 2
+    # Least Beneficial: 1
+    # Did not take: NaN (ignore)
+
+    # Rather than scanning the data once per course, build a single score
+    # matrix over every scorable group column; each course then only slices
+    # its own columns out of it.
+    score_map = {'Most Beneficial': 3, 'Neutral': 2, 'Least Beneficial': 1}
+
+    # Group columns by course, keeping first-seen order
+    courses = list(dict.fromkeys(info['course'] for info in relevant_columns))
+
+    # Pull every relevant column out of the frame once as a contiguous block;
+    # col_idx_map maps each header tuple to its position in that block.
+    all_cols = [info['col_idx'] for info in relevant_columns]
+    col_idx_map = {col: i for i, col in enumerate(all_cols)}
+
+    # If the cell has a value (rank), it means the user put the course in that group.
+    # We are interested in the presence of a value, not the rank itself.
+    # Scores are tiny integers, so float32 halves the memory of the matrix
+    # compared to float64; the presence mask stays bool.
+    # 'Did not take' (or any unknown group) scores NaN and is ignored.
+    mask = df.loc[:, all_cols].notna().to_numpy()
+    scores = np.array([score_map.get(info['group'], np.nan) for info in relevant_columns], dtype='float32')
+    per_cell = np.where(mask, scores[None, :], np.float32('nan'))
+
+    # Positions of each course's scorable group columns within the block
+    course_positions = {course: [] for course in courses}
+    for info in relevant_columns:
+        if info['group'] in score_map:
+            course_positions[info['course']].append(col_idx_map[info['col_idx']])
+
+    course_scores = {} # course_name -> average score
+
+    for course in courses:
+        positions = course_positions[course]
+        if not positions:
+            course_scores[course] = float('nan')
+            continue
+
+        # A respondent should only put a course in one group, so take the max
+        # across that course's group columns to get a single score per respondent
+        course_scores[course] = float(_row_max_mean(per_cell[:, positions]))
+
+    return pd.Series(course_scores)
+
+def plot_ranking(results_sorted, output_file):
+    # Horizontal bar chart of the sorted course ratings, saved to output_file
+    # Ensure the output directory exists
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    # Visualization: Horizontal bar chart
+    fig, ax = plt.subplots(figsize=(12, 10)) # Increased size for better readability
+    results_sorted.plot(kind='barh', color='skyblue', ax=ax)
+    ax.set_xlabel('Average Rating (3=Most Beneficial, 2=Neutral, 1=Least Beneficial)')
+    ax.set_title('Course Ratings (Highest to Lowest)')
+    ax.invert_yaxis() # To have the highest rating at the top
+    fig.tight_layout()
+
+    # Pin a modest dpi, drop the Software provenance entry and skip libpng's
+    # optimization pass; this small chart doesn't benefit from it
+    fig.savefig(output_file, dpi=90, bbox_inches='tight', metadata={'Software': None},
+                pil_kwargs={'optimize': False, 'compress_level': 1})
+    # Release the figure so repeated calls don't accumulate in pyplot's registry
+    plt.close(fig)
 
 def analyze_survey():
     # File path
     file_path = 'Grad Program Exit Survey Data.xlsx'
 
     # Read the Excel file
-    # header=[0, 1] reads the first two rows as headers
-    # Row 0 (index 0) contains the question text (e.g. "Please identify which MAcc CORE courses...")
-    # Row 1 (index 1) contains the ImportId (e.g. "{"ImportId":"QID84_G0_1_RANK"}")
+    # Row 0 contains the question text (e.g. "Please identify which MAcc CORE courses...")
+    # Row 1 contains the ImportId (e.g. "{"ImportId":"QID84_G0_1_RANK"}")
+    # Parsing the workbook dominates the runtime, so stream it once in
+    # openpyxl's read-only mode and only keep the relevant columns
     try:
-        df = pd.read_excel(file_path, header=[0, 1])
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
     except FileNotFoundError:
         print(f"Error: File '{file_path}' not found.")
         return
 
-    # Helper function to extract info from header
-    def parse_header(header_tuple):
-        # header_tuple[0] is the question text
-        # header_tuple[1] is the ImportId
-        q_text = str(header_tuple[0])
-
-        # Check if it's a relevant question (Core or Elective)
-        is_core = "CORE" in q_text
-        is_elective = "Elective" in q_text
-
-        if not (is_core or is_elective):
-            return None
-
-        # Extract Course Name and Group
-        # Pattern: ... - Ranks - [Group] - [Course Name] - Rank
-        # Note: The separator is usually " - "
-        match = re.search(r' - Ranks - (.*?) - (.*?) - Rank', q_text)
-        if match:
-            group = match.group(1)
-            course_name = match.group(2)
-            return {
-                'type': 'Core' if is_core else 'Elective',
-                'group': group,
-                'course': course_name,
-                'col_idx': header_tuple
-            }
-        return None
-
-    # Identify relevant columns
-    relevant_columns = []
-    for col in df.columns:
-        info = parse_header(col)
-        if info:
-            relevant_columns.append(info)
-
-    if not relevant_columns:
-        print("No relevant columns found (looking for 'CORE' or 'Elective' in header).")
+    try:
+        # Like read_excel's default sheet_name=0, always use the first sheet
+        # rather than whichever one was active when the file was saved
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header_rows = list(islice(rows, 2))
+        # An empty sheet has no data rows either; stop before parsing headers
+        if len(header_rows) < 2:
+            print("No data rows found.")
+            return
+        question_row, import_id_row = header_rows
+
+        # Identify relevant columns
+        relevant_columns = []
+        keep = []
+        for i, header_tuple in enumerate(zip(question_row, import_id_row)):
+            info = parse_header(header_tuple)
+            if info:
+                relevant_columns.append(info)
+                keep.append(i)
+
+        if not relevant_columns:
+            print("No relevant columns found (looking for 'CORE' or 'Elective' in header).")
+            return
+
+        # Rows can be shorter than the header when trailing cells are empty;
+        # fully blank rows carry no ratings and are skipped
+        data = [
+            [_cell_value(row, i) for i in keep]
+            for row in rows
+            if any(value is not None for value in row)
+        ]
+    finally:
+        wb.close()
+
+    columns = pd.MultiIndex.from_tuples([info['col_idx'] for info in relevant_columns])
+    df = pd.DataFrame(data, columns=columns)
+
+    if len(df) == 0:
+        print("No data rows found.")
         return
 
     print(f"Found {len(relevant_columns)} relevant columns.")
@@ -71,76 +212,15 @@ def analyze_survey():
              unique_courses[course_name] = []
         unique_courses[course_name].append(import_id)
 
-    for course, ids in unique_courses.items():
-        # Just show one ID as example or count
-        print(f"Course: {course} (IDs: {ids[0]}...)")
+    # Just show one ID as example or count; emitted as a single write
+    print('\n'.join(f"Course: {course} (IDs: {ids[0]}...)" for course, ids in unique_courses.items()))
 
-    # Process Data
-    # We need to calculate a score for each course for each respondent
-    # Scoring:
-    # Most Beneficial: 3
-    # Neutral: 2
-    # Least Beneficial: 1
-    # Did not take: NaN (ignore)
-
-    # We will reshape the data to long format or iterate row by row
-    # Since we need average per course, we can process by course
-
-    course_scores = {} # course_name -> list of scores
-
-    # Group columns by course
-    courses = list(unique_courses.keys())
-
-    for course in courses:
-        # Find columns for this course
-        cols = [info for info in relevant_columns if info['course'] == course]
-
-        # Extract data for these columns
-        # We need to find which column has a value for each row
-        # Since a respondent can only put a course in one group (usually), we take the max score?
-        # Wait, if they put it in multiple (which shouldn't happen), we need to handle it.
-        # But let's assume valid data.
-
-        # Create a temporary dataframe for this course
-        # Map columns to scores
-        course_df = pd.DataFrame()
-
-        for info in cols:
-            col_name = info['col_idx']
-            group = info['group']
-
-            score = None
-            if group == 'Most Beneficial':
-                score = 3
-            elif group == 'Neutral':
-                score = 2
-            elif group == 'Least Beneficial':
-                score = 1
-            elif group == 'Did not take':
-                score = None # Ignore
-
-            if score is not None:
-                # If the cell has a value (rank), it means the user put it in this group
-                # We are interested in the presence of a value, not the rank itself (based on our scoring model)
-                # Ensure we handle NaN correctly
-                series = df[col_name].notna().astype(int) * score
-                # Replace 0 with NaN if we want to ignore non-selected, but here 0 means "not in this group"
-                # We want to know which group it IS in.
-                # So if series is 3, it's in Most Beneficial. If 0, it's not.
-                course_df[group] = series.replace(0, float('nan'))
-
-        # Now for each row, we expect only one column to have a non-NaN value
-        # We take the max (or mean) across the row to get the single score for that respondent
-        if not course_df.empty:
-            respondent_scores = course_df.max(axis=1) # Returns NaN if all are NaN
-            # Filter out NaNs (Did not take or didn't answer)
-            valid_scores = respondent_scores.dropna()
-            course_scores[course] = valid_scores.mean()
-        else:
-            course_scores[course] = float('nan')
+    results_series = score_courses(df, relevant_columns)
 
-    # Create Series
-    results_series = pd.Series(course_scores)
+    # Nothing to rank or plot if no respondent scored any course
+    if results_series.dropna().empty:
+        print("No course ratings found; skipping ranking and chart.")
+        return
 
     # Rank from highest to lowest
     results_sorted = results_series.sort_values(ascending=False)
@@ -148,21 +228,8 @@ def analyze_survey():
     print("\nCourse Rankings (Highest to Lowest Average Rating):")
     print(results_sorted)
 
-    # Ensure outputs directory exists
-    output_dir = 'outputs'
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    # Visualization: Horizontal bar chart
-    plt.figure(figsize=(12, 10)) # Increased size for better readability
-    results_sorted.plot(kind='barh', color='skyblue')
-    plt.xlabel('Average Rating (3=Most Beneficial, 2=Neutral, 1=Least Beneficial)')
-    plt.title('Course Ratings (Highest to Lowest)')
-    plt.gca().invert_yaxis() # To have the highest rating at the top
-    plt.tight_layout()
-
-    output_file = os.path.join(output_dir, 'rank_order.png')
-    plt.savefig(output_file)
+    output_file = Path('outputs') / 'rank_order.png'
+    plot_ranking(results_sorted, output_file)
     print(f"\nChart saved to {output_file}")
 
 if __name__ == "__main__":